@@ -2,28 +2,108 @@
 Simple GDAL programm to get elevation
 (C) Kilian Eisenegger 2025
 """
-from osgeo import gdal
+import math
+import os
+from functools import lru_cache
+from osgeo import gdal, gdal_array
 import numpy as np
 gdal.UseExceptions()
 
-def get_elevation(lat, lon, dataset):
-    """Get elevation im m from GeoTIFF for lat/lon"""
-    gt = dataset.GetGeoTransform()
-    inv_gt = gdal.InvGeoTransform(gt)
-    px, py = gdal.ApplyGeoTransform(inv_gt, lon, lat)
-    
-    px, py = int(px), int(py)
+# 1 GB block cache for decompressed tiles, unless GDAL_CACHEMAX is set
+if gdal.GetConfigOption("GDAL_CACHEMAX") is None:
+    gdal.SetCacheMax(1 << 30)
+
+def memmap_band(dataset, band):
+    """Memory-map the band of an uncompressed, contiguously striped GeoTIFF, None otherwise"""
+    path = dataset.GetDescription()
+    structure = dataset.GetMetadata("IMAGE_STRUCTURE")
+    if (dataset.GetDriver().ShortName != "GTiff" or dataset.RasterCount != 1
+            or "COMPRESSION" in structure or "NBITS" in structure or not os.path.isfile(path)):
+        return None
+
+    width, height = dataset.RasterXSize, dataset.RasterYSize
+    block_w, block_h = band.GetBlockSize()
+    if block_w != width:
+        return None  # tiled layout
+
+    dtype = np.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType))
+    with open(path, "rb") as f:
+        dtype = dtype.newbyteorder("<" if f.read(2) == b"II" else ">")
+
+    # All strips must follow each other in the file to form one (height, width) array
+    n_strips = -(-height // block_h)
+    first = int(band.GetMetadataItem("BLOCK_OFFSET_0_0", "TIFF") or 0)
+    last = int(band.GetMetadataItem(f"BLOCK_OFFSET_0_{n_strips - 1}", "TIFF") or 0)
+    if first == 0 or last != first + (n_strips - 1) * block_h * width * dtype.itemsize:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", offset=first, shape=(height, width))
+
+def open_dem(path):
+    """Open a GeoTIFF once and return (dataset, band, inverse geotransform, memmap or None).
+    The files stay open while cached, close_dems() closes them"""
+    # Absolute path as key: a changed working directory or str/Path must not mix up entries
+    return open_dem_cached(os.path.abspath(str(path)))
+
+def close_dems():
+    """Drop all cached GeoTIFFs opened with open_dem"""
+    open_dem_cached.cache_clear()
+
+@lru_cache(maxsize=16)
+def open_dem_cached(path):
+    """open_dem for an absolute path"""
+    dataset = gdal.Open(path)
     band = dataset.GetRasterBand(1)
+    return dataset, band, gdal.InvGeoTransform(dataset.GetGeoTransform()), memmap_band(dataset, band)
+
+def get_elevation(lat, lon, dem):
+    """Get elevation im m from GeoTIFF opened with open_dem for lat/lon"""
+    dataset, band, inv_gt, mm = dem
+    px = math.floor(inv_gt[0] + inv_gt[1] * lon + inv_gt[2] * lat)
+    py = math.floor(inv_gt[3] + inv_gt[4] * lon + inv_gt[5] * lat)
+    if not (0 <= px < dataset.RasterXSize and 0 <= py < dataset.RasterYSize):
+        return None
+    if mm is not None:
+        return float(mm[py, px])
     data = band.ReadAsArray(px, py, 1, 1)
     
     if data is None:
         return None
     return float(data[0,0])
 
+def get_elevations(lats, lons, dem):
+    """Get elevations in m from GeoTIFF opened with open_dem for arrays of lat/lon,
+    NaN outside the raster or on nodata"""
+    dataset, band, inv_gt, mm = dem
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    px = np.floor(inv_gt[0] + inv_gt[1] * lons + inv_gt[2] * lats).astype(np.int64)
+    py = np.floor(inv_gt[3] + inv_gt[4] * lons + inv_gt[5] * lats).astype(np.int64)
+
+    elevs = np.full(lats.shape, np.nan)
+    valid = (px >= 0) & (px < dataset.RasterXSize) & (py >= 0) & (py < dataset.RasterYSize)
+    if not valid.any():
+        return elevs
+    px, py = px[valid], py[valid]
+
+    if mm is not None:
+        z = mm[py, px]
+    else:
+        # One read of the window covering all points instead of one GDAL call per point
+        xmin, ymin = int(px.min()), int(py.min())
+        data = band.ReadAsArray(xmin, ymin, int(px.max()) - xmin + 1, int(py.max()) - ymin + 1)
+        z = data[py - ymin, px - xmin]
+
+    # Gather and compare nodata in the native type (int16 for ASTER), NaN only in the result
+    nodata = band.GetNoDataValue()
+    elevs[valid] = z
+    if nodata is not None:
+        elevs[np.flatnonzero(valid)[z == nodata]] = np.nan
+    return elevs
+
 if __name__ == "__main__":
     # Load ASTER DEM 
     dem_path = "dem_aster.tif"
-    ds = gdal.Open(dem_path)
+    dem = open_dem(dem_path)
 
     coords = [
         [46.5776, 8.0059],   # Eiger
@@ -31,6 +111,6 @@ if __name__ == "__main__":
         [46.5475, 7.9625],   # Jungfrau
     ]
 
-    for lat, lon in coords:
-        h = get_elevation(lat, lon, ds)
+    lats, lons = zip(*coords)
+    for lat, lon, h in zip(lats, lons, get_elevations(lats, lons, dem)):
         print(f"{lat}, {lon} → {h:.1f} m")
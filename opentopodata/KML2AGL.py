@@ -2,22 +2,54 @@
 # Read KML, replace Altitude with AGL, save KML
 # Work with array [[lat, lon, alt]]
 
+import io
+import numpy as np
 import requests
 import time
-import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree as ET
 from pathlib import Path
 import sys
 
 API_URL = "https://api.opentopodata.org/v1/aster30m"
 # API_URL = "http://localhost:5100/v1/aster30m"
-BATCH_SIZE = 100
+BATCH_SIZE = 100  # must not exceed max_locations_per_request of the server
 SLEEP_SEC = 1.1
+CONCURRENCY = 5
+GRID_PER_DEG = 3600  # ASTER 30m grid, 1 arc second
+
+# Keep-alive connection pool shared by all batch requests
+SESSION = requests.Session()
+adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8,
+                      max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                                        allowed_methods=["GET", "POST"]))
+SESSION.mount("https://", adapter)
+SESSION.mount("http://", adapter)
+
+
+def parse_coordinates(text):
+    """Parse a KML "lon,lat[,alt] ..." blob into an array [[lon, lat, alt]]"""
+    tuples = text.split()
+    # Fast path: every tuple has an altitude, parse the whole blob in one NumPy call
+    if all(c.count(",") == 2 for c in tuples):
+        return np.array(text.replace(",", " ").split(), dtype=np.float64).reshape(-1, 3)
+
+    # Altitude is optional in KML, missing values become 0
+    rows = [c.split(",") for c in tuples]
+    for c, row in zip(tuples, rows):
+        if len(row) not in (2, 3):
+            raise ValueError(f"invalid coordinate tuple '{c}'")
+    return np.array([row + ["0"] * (3 - len(row)) for row in rows], dtype=np.float64).reshape(-1, 3)
 
 
 def read_kml(filepath, logf):
-    """Read KML and return coordinates as a list [lat, lon, alt]"""
+    """Read KML and return coordinates as an array [[lat, lon, alt]],
+    the <coordinates> elements and the (start, stop) rows belonging to each"""
     try:
-        tree = ET.parse(filepath)
+        parser = ET.XMLParser(remove_blank_text=True, huge_tree=True)
+        tree = ET.parse(str(filepath), parser)
         root = tree.getroot()
     except Exception as e:
         logf.write(f"[ERROR] KML lesen fehlgeschlagen: {e}\n")
@@ -25,60 +57,91 @@ def read_kml(filepath, logf):
 
     ns = {"kml": "http://www.opengis.net/kml/2.2"}
 
-    coords = []
-    for coord in root.findall(".//kml:coordinates", ns):
-        raw = coord.text.strip().split()
-        for c in raw:
-            lon, lat, alt = map(float, c.split(","))
-            coords.append([lat, lon, alt])
+    coord_elems = root.findall(".//kml:coordinates", ns)
+    try:
+        blocks = [parse_coordinates(coord.text or "") for coord in coord_elems]
+    except ValueError as e:
+        logf.write(f"[ERROR] Invalid KML coordinates: {e}\n")
+        sys.exit(1)
+    if not blocks:
+        return np.empty((0, 3)), coord_elems, [], tree
+    coords = np.concatenate(blocks)[:, [1, 0, 2]]
+
+    stops = np.cumsum([len(b) for b in blocks]).tolist()
+    slices = list(zip([0] + stops[:-1], stops))
+
+    return coords, coord_elems, slices, tree
+
 
-    return coords, tree, ns
+def fetch_batch(locations):
+    """Query OpenTopoData for one batch "lat,lon|lat,lon..." and return the results"""
+    r = SESSION.post(API_URL, json={"locations": locations}, timeout=30)
+    r.raise_for_status()
+    return r.json().get("results", [])
 
 
 def fetch_elevations(coords, logf):
-    """Get elevation values from OpenTopoData for a list of [lat, lon, alt"""
-    updated = []
-    for i in range(0, len(coords), BATCH_SIZE):
-        batch = coords[i:i + BATCH_SIZE]
-
-        # Query-String bauen: "lat,lon%7Clat,lon..."
-        loc_str = "%7C".join(f"{lat},{lon}" for lat, lon, _ in batch)
-        url = f"{API_URL}?locations={loc_str}"
-
-        logf.write(f"[INFO] Hole Höhen für Batch {i//BATCH_SIZE+1} von {len(coords)//BATCH_SIZE+1}: {url}\n")
-
-        try:
-            r = requests.get(url, timeout=15)
-            r.raise_for_status()
-            data = r.json()
-        except Exception as e:
-            logf.write(f"[ERROR] Request failed: {e}\n")
-            sys.exit(1)
-
-        results = data.get("results", [])
-        for (lat, lon, _), res in zip(batch, results):
-            elev = res.get("elevation", 0)
-            updated.append([lat, lon, elev])
-
-        time.sleep(SLEEP_SEC)
-
-    return updated
-
-
-def write_kml(coords, tree, ns, output_file, logf):
-    """Overwrite KML with new heights"""
-    idx = 0
-    for coord_elem in tree.findall(".//kml:coordinates", ns):
-        raw = coord_elem.text.strip().split()
-        new_coords = []
-        for _ in raw:
-            lat, lon, alt = coords[idx]
-            new_coords.append(f"{lon},{lat},{alt}")
-            idx += 1
-        coord_elem.text = " ".join(new_coords)
+    """Get elevation values from OpenTopoData for an array [[lat, lon, alt]]"""
+    # Query each ASTER grid cell only once, repeated waypoints reuse its elevation
+    cells = np.round(coords[:, :2] * GRID_PER_DEG).astype(np.int32)
+    _, first, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    unique = coords[first]
+    logf.write(f"[INFO] {len(unique)} unique grid cells for {len(coords)} Waypoints\n")
+
+    jobs = []
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        for i in range(0, len(unique), BATCH_SIZE):
+            batch = unique[i:i + BATCH_SIZE]
+
+            # POST-Body bauen: "lat,lon|lat,lon..."
+            loc_str = "|".join(f"{lat},{lon}" for lat, lon, _ in batch)
+
+            # Stop on the first failed batch instead of sending the rest
+            failed = next((job for _, job in jobs if job.done() and job.exception()), None)
+            if failed is not None:
+                logf.write(f"[ERROR] Request failed: {failed.exception()}\n")
+                pool.shutdown(cancel_futures=True)
+                sys.exit(1)
+
+            logf.write(f"[INFO] Hole Höhen für Batch {i//BATCH_SIZE+1} von {len(unique)//BATCH_SIZE+1}: {loc_str}\n")
+            jobs.append((len(batch), pool.submit(fetch_batch, loc_str)))
+
+            # Start at most one request per SLEEP_SEC, responses arrive in the background
+            time.sleep(SLEEP_SEC)
+
+        elevs = []
+        n_null = 0
+        for n, job in jobs:
+            try:
+                results = job.result()
+            except Exception as e:
+                logf.write(f"[ERROR] Request failed: {e}\n")
+                sys.exit(1)
+
+            # A short batch would shift all later elevations onto the wrong cells
+            if len(results) != n:
+                logf.write(f"[ERROR] {len(results)} results for {n} locations\n")
+                sys.exit(1)
+
+            batch_elevs = [res.get("elevation") for res in results]
+            n_null += batch_elevs.count(None)
+            elevs.extend(0 if elev is None else elev for elev in batch_elevs)
+
+    if n_null:
+        logf.write(f"[WARNING] {n_null} grid cells without elevation, set to 0 m\n")
+    elevs = np.asarray(elevs, dtype=np.float64)[inverse.ravel()]
+    return np.column_stack((coords[:, 0], coords[:, 1], elevs))
+
+
+def write_kml(coords, coord_elems, slices, tree, output_file, logf):
+    """Overwrite KML with new heights, using the elements found by read_kml"""
+    for (start, stop), coord_elem in zip(slices, coord_elems):
+        buf = io.StringIO()
+        np.savetxt(buf, coords[start:stop, [1, 0, 2]], fmt="%.6f,%.6f,%.1f", newline=" ")
+        coord_elem.text = buf.getvalue().rstrip()
 
     try:
-        tree.write(output_file, encoding="utf-8", xml_declaration=True)
+        tree.write(str(output_file), encoding="utf-8", xml_declaration=True, pretty_print=False)
         logf.write(f"[INFO] File saved: {output_file}\n")
     except Exception as e:
         logf.write(f"[ERROR] Failed to save: {e}\n")
@@ -96,11 +159,11 @@ if __name__ == "__main__":
     with open(log_file, "w", encoding="utf-8") as logf:
         logf.write("[START] OpenTopoData KML elevation query\n")
 
-        coords, tree, ns = read_kml(input_file, logf)
+        coords, coord_elems, slices, tree = read_kml(input_file, logf)
         logf.write(f"[INFO] {len(coords)} Waypoints found\n")
 
         new_coords = fetch_elevations(coords, logf)
-        write_kml(new_coords, tree, ns, output_file, logf)
+        write_kml(new_coords, coord_elems, slices, tree, output_file, logf)
 
         logf.write("[END] Processing completed\n")
 
@@ -0,0 +1,56 @@
+# Convert GeoTIFF's to Cloud Optimized GeoTIFF (COG)
+# Tiled 256x256 blocks with DEFLATE and internal overviews
+# A single pixel read only decompresses one block instead of a whole strip
+# Only compressed striped GeoTIFFs are converted, uncompressed or tiled files are skipped
+# Kilian Eisenegger 2025
+
+import sys
+from pathlib import Path
+from osgeo import gdal
+
+gdal.UseExceptions()
+
+CREATION_OPTIONS = [
+    "COMPRESS=DEFLATE",
+    "PREDICTOR=YES",
+    "BLOCKSIZE=256",
+    "OVERVIEWS=AUTO",
+]
+
+def skip_reason(path):
+    """Why a GeoTIFF gains nothing from COG conversion, None if it should be converted"""
+    ds = gdal.Open(str(path))
+    if "COMPRESSION" not in ds.GetMetadata("IMAGE_STRUCTURE"):
+        return "uncompressed, direct reads are faster than a DEFLATE block"
+    block_w, _ = ds.GetRasterBand(1).GetBlockSize()
+    if block_w != ds.RasterXSize:
+        return "already tiled"
+    return None
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python Convert-COG-GeoTiff.py input_folder output_folder")
+        sys.exit(1)
+
+    indir = Path(sys.argv[1])
+    outdir = Path(sys.argv[2])
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    tif_files = sorted(indir.glob("*.tif"))
+    print(f"{len(tif_files)} GeoTIFFs found.")
+
+    for path in tif_files:
+        out_path = outdir / path.name
+        if out_path.exists():
+            print(f"✅ Already available: {out_path.name}")
+            continue
+
+        reason = skip_reason(path)
+        if reason is not None:
+            print(f"⏭️ Skip {path.name}: {reason}")
+            continue
+
+        print(f"🔄 Convert {path.name} ...")
+        gdal.Translate(str(out_path), str(path), format="COG", creationOptions=CREATION_OPTIONS)
+
+    print(f"🎉 All COGs are ready in {outdir}")
@@ -8,6 +8,8 @@ import os
 import re
 import requests
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 # URL with all ASTER GDEM V3 download links
 URL_LIST = "https://www.opentopodata.org/datasets/aster30m_urls.txt"
@@ -22,6 +24,10 @@ LAT_MAX += 1
 LON_MIN -= 1
 LON_MAX += 1
 
+# Parallel downloads
+MAX_WORKERS = 8
+CHUNK_SIZE = 1 << 20
+
 # Destination folder
 OUTDIR = "aster_swiss_tiles"
 os.makedirs(OUTDIR, exist_ok=True)
@@ -29,32 +35,25 @@ os.makedirs(OUTDIR, exist_ok=True)
 # Download the complete URL list
 resp = requests.get(URL_LIST)
 resp.raise_for_status()
-urls = resp.text.splitlines()
 
-def parse_tile_name(url):
-    match = re.search(r'N(\d{2})E(\d{3})', url)
-    if match:
-        lat = int(match.group(1))
-        lon = int(match.group(2))
-        return lat, lon
-    return None, None
+# One pass over the whole list: every line with its tile N..E... coordinates
+TILE_RE = re.compile(r'^([^\r\n]*?N(\d{2})E(\d{3})[^\r\n]*)\r?$', re.M)
 
 # Filter only the relevant tiles (Switzerland + buffer)
-swiss_urls = []
-for url in urls:
-    lat, lon = parse_tile_name(url)
-    if lat is None:
-        continue
-    if LAT_MIN <= lat <= LAT_MAX and LON_MIN <= lon <= LON_MAX:
-        swiss_urls.append(url)
+swiss_urls = [url for url, lat, lon in TILE_RE.findall(resp.text)
+              if LAT_MIN <= int(lat) <= LAT_MAX and LON_MIN <= int(lon) <= LON_MAX]
 
 print(f"{len(swiss_urls)} Tiles found (incl. buffer).")
 
 # Session that automatically uses .netrc
+# Shared by all download threads, the pool keeps TCP+TLS connections alive
 session = requests.Session()
 session.headers.update({"User-Agent": "aster-downloader"})
+adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
 
-for url in swiss_urls:
+def download_one(url):
     filename = url.split("/")[-1]
     zip_path = os.path.join(OUTDIR, filename)
 
@@ -62,7 +61,7 @@ for url in swiss_urls:
     tif_path = os.path.join(OUTDIR, tif_name)
     if os.path.exists(tif_path):
         print(f"✅ Already available: {tif_name}")
-        continue
+        return
 
     print(f"⬇️ Lade {filename} ...")
     r = session.get(url, stream=True)
@@ -71,7 +70,7 @@ for url in swiss_urls:
     r.raise_for_status()
 
     with open(zip_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=8192):
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
             if chunk:
                 f.write(chunk)
 
@@ -82,6 +81,9 @@ for url in swiss_urls:
     os.remove(zip_path)
     print(f"🗑️ ZIP removed: {filename}")
 
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+    list(pool.map(download_one, swiss_urls))
+
 print("🎉 All GeoTIFFs for Switzerland + 1° buffer are ready!")
 
 